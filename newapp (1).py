@@ -1,36 +1,76 @@
 import streamlit as st
 import pandas as pd
-import requests
-import json
-from typing import List
+import httpx
+import io
+import ijson
+import orjson
+import heapq
+from typing import Iterator, List
 import plotly.express as px
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 # FastAPI backend URL
 API_BASE_URL = "http://localhost:8000"
 
-def load_urls_from_json(file_content):
-    """Load URLs from JSON file content"""
+# URLs per chunk when streaming the request body to the API
+UPLOAD_BATCH_SIZE = 1000
+
+@st.cache_resource
+def get_http_client():
+    """Shared HTTP client so every script rerun reuses pooled connections to the API"""
+    return httpx.Client(
+        base_url=API_BASE_URL,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+    )
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_urls_from_json(file_content: bytes) -> List[str]:
+    """Load URLs from raw JSON file bytes (cached per upload)"""
     try:
-        data = json.loads(file_content)
+        # Stream array items one at a time instead of building the whole document tree
         urls = []
-        for item in data:
-            if isinstance(item, dict) and 'name' in item:
+        for item in ijson.items(io.BytesIO(file_content), 'item'):
+            # Non-string names (null, numbers) can't be analyzed as URLs
+            if isinstance(item, dict) and isinstance(item.get('name'), str):
                 urls.append(item['name'])
         return urls
     except Exception as e:
         st.error(f"Error loading JSON: {e}")
         return []
 
+def iter_url_lines(urls, batch_size: int = UPLOAD_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield URL batches as bytes for a chunked request body, each URL newline-terminated"""
+    for start in range(0, len(urls), batch_size):
+        batch = urls[start:start + batch_size]
+        yield "".join(f"{url}\n" for url in batch).encode('utf-8')
+
+@st.cache_data(ttl=600, show_spinner=False)
+def fetch_analysis(urls: tuple[str, ...]):
+    """POST URLs to FastAPI; cached per URL tuple, errors propagate uncached"""
+    if any('\n' in url for url in urls):
+        # A newline inside a name can't be sent line-delimited; fall back to the JSON endpoint
+        path, content, content_type = "/analyze", orjson.dumps({"urls": urls}), "application/json"
+    else:
+        # Newline-delimited body streamed in batches: no JSON array and no full-body copy
+        path, content, content_type = "/analyze/text", iter_url_lines(urls), "text/plain; charset=utf-8"
+    response = get_http_client().post(
+        path,
+        content=content,
+        headers={"Content-Type": content_type},
+        # Large analyses can run for minutes; only /health gets a short timeout
+        timeout=None
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
 def analyze_with_api(urls: List[str]):
     """Send URLs to FastAPI for analysis"""
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/analyze",
-            json={"urls": urls}
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return fetch_analysis(tuple(urls))
+    except (httpx.HTTPError, ValueError) as e:
+        # ValueError covers an undecodable response body (orjson.JSONDecodeError)
         st.error(f"API request failed: {e}")
         return None
 
@@ -78,39 +118,39 @@ def display_analysis_results(result):
     # Display statistics
     st.subheader("📈 Pattern Statistics")
     
-    # Calculate pattern counts
-    pattern_counts = []
-    for parent_pattern, entries in data.items():
+    # Pre-aggregate: the pie chart needs two numbers and the bar chart ten rows
+    type_counts = {'URI Pattern': 0, 'Sub-Pattern': 0}
+    for entries in data.values():
+        type_counts['URI Pattern'] += len(entries)
         for entry in entries:
-            pattern_counts.append({
-                'Pattern': entry.get('uri', ''),
-                'SubPatterns Count': len(entry.get('subPatterns', [])),
-                'Type': 'URI Pattern'
-            })
-            for sub_pattern in entry.get('subPatterns', []):
-                pattern_counts.append({
-                    'Pattern': sub_pattern,
-                    'SubPatterns Count': 0,
-                    'Type': 'Sub-Pattern'
-                })
+            type_counts['Sub-Pattern'] += len(entry.get('subPatterns', []))
     
-    if pattern_counts:
-        patterns_df = pd.DataFrame(pattern_counts)
-        
-        # Show pattern types distribution
-        type_counts = patterns_df['Type'].value_counts()
-        if not type_counts.empty:
-            fig_types = px.pie(
-                values=type_counts.values,
-                names=type_counts.index,
-                title="Pattern Types Distribution"
-            )
-            st.plotly_chart(fig_types, use_container_width=True)
+    if type_counts['URI Pattern']:
+        # Show pattern types distribution (largest first, empty types omitted)
+        ordered_types = sorted(
+            ((type_, count) for type_, count in type_counts.items() if count),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        fig_types = px.pie(
+            values=[count for _, count in ordered_types],
+            names=[type_ for type_, _ in ordered_types],
+            title="Pattern Types Distribution"
+        )
+        st.plotly_chart(fig_types, use_container_width=True)
         
-        # Show top patterns by sub-pattern count
-        uri_patterns = patterns_df[patterns_df['Type'] == 'URI Pattern']
-        if not uri_patterns.empty:
-            top_patterns = uri_patterns.nlargest(10, 'SubPatterns Count')
+        # Show top patterns by sub-pattern count; only these rows ever become a DataFrame
+        top_entries = heapq.nlargest(
+            10,
+            (
+                (entry.get('uri', ''), len(entry.get('subPatterns', [])))
+                for entries in data.values()
+                for entry in entries
+            ),
+            key=lambda item: item[1]
+        )
+        if top_entries:
+            top_patterns = pd.DataFrame(top_entries, columns=['Pattern', 'SubPatterns Count'])
             fig_patterns = px.bar(
                 top_patterns,
                 x='SubPatterns Count',
@@ -121,6 +161,26 @@ def display_analysis_results(result):
             fig_patterns.update_layout(yaxis={'categoryorder': 'total ascending'})
             st.plotly_chart(fig_patterns, use_container_width=True)
 
+@st.cache_data(ttl=600, show_spinner=False)
+def build_patterns_csv(data) -> bytes:
+    """Build the simplified patterns CSV with Arrow's C++ writer (cached per result)"""
+    pattern_data = []
+    for parent_pattern, entries in data.items():
+        for entry in entries:
+            pattern_data.append({
+                'Parent Pattern': parent_pattern,
+                'URI Pattern': entry.get('uri', ''),
+                'SubPatterns Count': len(entry.get('subPatterns', [])),
+                'SubPatterns': ' | '.join(entry.get('subPatterns', []))
+            })
+    
+    if not pattern_data:
+        return b""
+    
+    buffer = io.BytesIO()
+    pa_csv.write_csv(pa.Table.from_pylist(pattern_data), buffer)
+    return buffer.getvalue()
+
 def main():
     st.set_page_config(
         page_title="URL Pattern Analyzer",
@@ -150,7 +210,7 @@ def main():
         )
         
         if uploaded_file is not None:
-            file_content = uploaded_file.getvalue().decode('utf-8')
+            file_content = uploaded_file.getvalue()
             urls = load_urls_from_json(file_content)
             st.sidebar.success(f"Loaded {len(urls)} URLs from file")
     
@@ -167,7 +227,7 @@ def main():
     
     # API status check
     try:
-        health_response = requests.get(f"{API_BASE_URL}/health", timeout=5)
+        health_response = get_http_client().get("/health", timeout=5)
         if health_response.status_code == 200:
             st.sidebar.success("✅ API Connected")
         else:
@@ -197,7 +257,7 @@ def main():
         
         with col1:
             # Download as JSON
-            json_data = json.dumps(analysis_result, indent=2)
+            json_data = orjson.dumps(analysis_result, option=orjson.OPT_INDENT_2)
             st.download_button(
                 label="Download Analysis JSON",
                 data=json_data,
@@ -207,20 +267,9 @@ def main():
         
         with col2:
             # Create simplified CSV for patterns
-            pattern_data = []
-            data = analysis_result.get('data', {})
-            for parent_pattern, entries in data.items():
-                for entry in entries:
-                    pattern_data.append({
-                        'Parent Pattern': parent_pattern,
-                        'URI Pattern': entry.get('uri', ''),
-                        'SubPatterns Count': len(entry.get('subPatterns', [])),
-                        'SubPatterns': ' | '.join(entry.get('subPatterns', []))
-                    })
+            csv_data = build_patterns_csv(analysis_result.get('data', {}))
             
-            if pattern_data:
-                patterns_df = pd.DataFrame(pattern_data)
-                csv_data = patterns_df.to_csv(index=False)
+            if csv_data:
                 st.download_button(
                     label="Download Patterns CSV",
                     data=csv_data,
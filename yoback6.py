@@ -1,38 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 import uvicorn
-from urllib.parse import urlparse, parse_qs, unquote
+from urllib.parse import urlparse, parse_qsl
 import re
-from collections import defaultdict, Counter
+import codecs
+from collections import Counter
 import json
 
 app = FastAPI(
     title="URL Pattern Analyzer API",
     description="API for analyzing and clustering URL patterns with sub-pattern detection",
-    version="2.5.0"
+    version="2.5.0",
+    default_response_class=ORJSONResponse
 )
 
 class URLAnalyzer:
     def __init__(self):
         # Remove forward slash from special characters that need escaping
         self.special_chars = ['.', '^', '$', '*', '+', '?', '{', '}', '[', ']', '\\', '|', '(', ')']
+        # Regex character class built from special_chars, so the list stays the single source
+        special_class = '[' + ''.join(re.escape(c) for c in self.special_chars) + ']'
+        # Single-scan escape: matches either a (.*?) wildcard (kept as-is) or one special char
+        self._ESC_RE = re.compile(r'\(\.\*\?\)|' + special_class)
+        # Any special char at all (used to tell patterns from literal URIs)
+        self._HAS_SPECIAL_RE = re.compile(special_class)
+
+        # Precompiled patterns used on every URL / path segment
+        self._HEX_SEARCH = re.compile(r'[a-f0-9]{8,}', re.IGNORECASE)
+        self._HTTP_RE = re.compile(r'^(GET|POST|PUT|DELETE|PATCH|OPTIONS|HEAD)\s+(https?://\S+)(?:\s+HTTP/\d\.\d)?$')
+        self._SPLIT_RE = re.compile(r'[_\-. ]')
+        self._QSPLIT_RE = re.compile(r'(\?|&|=)')
+        self._HEXID_RE = re.compile(r'[a-f0-9-]{12,}', re.IGNORECASE)
         
     def escape_special_chars_for_pattern(self, text: str) -> str:
         """Escape special characters for regex patterns, but preserve (.*?) wildcards"""
         if not text:
             return text
             
-        # First, protect existing wildcards
-        protected_text = text.replace('(.*?)', '___WILDCARD___')
-        
-        # Escape special characters (except forward slash)
-        for char in self.special_chars:
-            protected_text = protected_text.replace(char, f'\\{char}')
-        
-        # Restore wildcards
-        protected_text = protected_text.replace('___WILDCARD___', '(.*?)')
-        return protected_text
+        # Escape special characters (except forward slash) in one pass, leaving wildcards intact
+        return self._ESC_RE.sub(self._escape_match, text)
+    
+    @staticmethod
+    def _escape_match(match: re.Match) -> str:
+        """Replacement for _ESC_RE: keep (.*?) wildcards, escape any other match"""
+        token = match.group(0)
+        if token == '(.*?)':
+            return token
+        return f'\\{token}'
     
     def extract_http_method(self, url_string: str) -> tuple[str, str]:
         """Extract HTTP method from URL string"""
@@ -42,10 +59,7 @@ class URLAnalyzer:
         # Remove quotes if present
         clean_url = clean_url.strip('"')
         
-        http_match = re.match(
-            r'^(GET|POST|PUT|DELETE|PATCH|OPTIONS|HEAD)\s+(https?://\S+)(?:\s+HTTP/\d\.\d)?$',
-            clean_url
-        )
+        http_match = self._HTTP_RE.match(clean_url)
         if http_match:
             method = http_match.group(1)
             clean_url = http_match.group(2)
@@ -54,116 +68,130 @@ class URLAnalyzer:
     
     def should_normalize_segment(self, segment: str) -> bool:
         """Check if a path segment should be normalized to wildcard"""
-        # UUID pattern
-        if re.fullmatch(r'[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}', segment, re.IGNORECASE):
-            return True
-        
-        # Hex strings (like in JS/CSS files)
-        if re.fullmatch(r'[a-f0-9]{12,}', segment, re.IGNORECASE):
-            return True
+        # Checks ordered cheapest first; most segments are short words rejected on length alone
+        length = len(segment)
+        if length <= 5:
+            return False
             
         # Long numeric IDs
-        if segment.isdigit() and len(segment) > 5:
+        if segment.isdigit():
             return True
             
-        # Mixed alphanumeric with specific patterns (like in asset files)
-        if re.search(r'[a-f0-9]{8,}', segment, re.IGNORECASE) and len(segment) > 10:
-            return True
+        if length <= 10:
+            return False
             
-        return False
+        # Runs of 8+ hex chars: UUIDs, hex strings (like in JS/CSS files) and mixed
+        # alphanumeric asset names. A UUID or a 12+ char hex string always contains such a run.
+        return self._HEX_SEARCH.search(segment) is not None
     
-    def normalize_url_pattern(self, url: str, aggressive_normalization: bool = False, escape_special_chars: bool = False) -> str:
-        """Normalize URL to create pattern with (.*?) for dynamic parts"""
-        method, clean_url = self.extract_http_method(url)
+    def normalize_url_pattern(self, url: str, aggressive_normalization: bool = False, escape_special_chars: bool = False,
+                              parse_cache: Optional[Dict[str, tuple]] = None) -> str:
+        """Normalize URL to create pattern with (.*?) for dynamic parts.
         
+        parse_cache, if given, holds _parse_url results for the caller's batch so several
+        normalization passes over the same URLs parse each one only once.
+        """
         try:
-            parsed = urlparse(clean_url)
-            
-            # Handle scheme and netloc - escape if needed
-            if escape_special_chars:
-                scheme = self.escape_special_chars_for_pattern(parsed.scheme)
-                netloc = self.escape_special_chars_for_pattern(parsed.netloc)
-            else:
-                scheme = parsed.scheme
-                netloc = parsed.netloc
-            
-            path = parsed.path
-            query = parsed.query
-            
-            # Normalize path segments
-            path_segments = [seg for seg in path.split('/') if seg]
-            normalized_path_segments = []
-            
-            for segment in path_segments:
-                if self.should_normalize_segment(segment):
-                    normalized_path_segments.append('(.*?)')
-                elif aggressive_normalization and (any(char.isdigit() for char in segment) and len(segment) > 8):
-                    parts = re.split(r'[_\-. ]', segment)
-                    if any(part.isdigit() and len(part) > 3 for part in parts):
-                        normalized_path_segments.append('(.*?)')
-                    else:
-                        if escape_special_chars:
-                            normalized_path_segments.append(self.escape_special_chars_for_pattern(segment))
-                        else:
-                            normalized_path_segments.append(segment)
-                else:
-                    if escape_special_chars:
-                        normalized_path_segments.append(self.escape_special_chars_for_pattern(segment))
-                    else:
-                        normalized_path_segments.append(segment)
-            
-            # Build path - NO escaping of forward slashes
-            normalized_path = '/' + '/'.join(normalized_path_segments)
-            
-            # Normalize query parameters
-            normalized_query_parts = []
-            if query:
-                # URL decode the query string first
-                decoded_query = unquote(query)
-                query_params = parse_qs(decoded_query)
-                
-                for key, values in query_params.items():
-                    if escape_special_chars:
-                        escaped_key = self.escape_special_chars_for_pattern(key)
-                    else:
-                        escaped_key = key
-                    
-                    for value in values:
-                        # Check if value should be normalized
-                        if aggressive_normalization and (value.isdigit() or 
-                            re.fullmatch(r'[a-f0-9-]{12,}', value, re.IGNORECASE) or
-                            len(value) > 15 or
-                            self.should_normalize_segment(value)):
-                            normalized_query_parts.append(f"{escaped_key}=(.*?)")
-                        else:
-                            if escape_special_chars:
-                                escaped_value = self.escape_special_chars_for_pattern(value)
-                            else:
-                                escaped_value = value
-                            normalized_query_parts.append(f"{escaped_key}={escaped_value}")
-            
-            normalized_query = '&'.join(normalized_query_parts)
-            
-            # Build the normalized URL properly
-            normalized_url = f"{scheme}://{netloc}{normalized_path}"
-            if normalized_query:
-                # For patterns, escape the ? that separates path from query
-                if escape_special_chars:
-                    normalized_url += f"\\?{normalized_query}"
-                else:
-                    normalized_url += f"?{normalized_query}"
-            
-            if method:
-                normalized_url = f"{method} {normalized_url}"
-                
-            return normalized_url
-            
+            parts = self._parse_url_cached(url, parse_cache)
+            return self._render_pattern(parts, aggressive_normalization, escape_special_chars)
         except Exception as e:
             print(f"Error normalizing URL {url}: {e}")
             if escape_special_chars:
                 return self.escape_special_chars_for_pattern(url)
             return url
     
+    def _parse_url_cached(self, url: str, parse_cache: Optional[Dict[str, tuple]]) -> tuple:
+        """_parse_url looked up in / stored to parse_cache when the caller provides one"""
+        if parse_cache is None:
+            return self._parse_url(url)
+        parts = parse_cache.get(url)
+        if parts is None:
+            parts = parse_cache[url] = self._parse_url(url)
+        return parts
+    
+    def _parse_url(self, url: str) -> tuple:
+        """Split URL into (method, scheme, netloc, path_segments, query_pairs) with segments pre-classified.
+        
+        Each path segment is (segment, always_wildcard, aggressive_wildcard) and each query
+        pair is (key, value, aggressive_wildcard), so rendering needs no further parsing.
+        """
+        method, clean_url = self.extract_http_method(url)
+        parsed = urlparse(clean_url)
+        
+        # Classify path segments
+        path_segments = []
+        for segment in parsed.path.split('/'):
+            if not segment:
+                continue
+            always_wildcard = self.should_normalize_segment(segment)
+            aggressive_wildcard = always_wildcard or (
+                len(segment) > 8 and any(map(str.isdigit, segment)) and
+                any(part.isdigit() and len(part) > 3 for part in self._SPLIT_RE.split(segment))
+            )
+            path_segments.append((segment, always_wildcard, aggressive_wildcard))
+        
+        # Classify query parameters
+        query_pairs = []
+        if parsed.query:
+            # parse_qsl splits and URL-decodes in one pass, yielding pairs in original order
+            for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+                aggressive_wildcard = bool(value.isdigit() or 
+                    self._HEXID_RE.fullmatch(value) or
+                    len(value) > 15 or
+                    self.should_normalize_segment(value))
+                query_pairs.append((key, value, aggressive_wildcard))
+        
+        return method, parsed.scheme, parsed.netloc, path_segments, query_pairs
+    
+    def _render_pattern(self, parts: tuple, aggressive_normalization: bool, escape_special_chars: bool) -> str:
+        """Build the pattern string from _parse_url output"""
+        method, scheme, netloc, path_segments, query_pairs = parts
+        escape = self.escape_special_chars_for_pattern if escape_special_chars else None
+        
+        # Handle scheme and netloc - escape if needed
+        if escape:
+            scheme = escape(scheme)
+            netloc = escape(netloc)
+        
+        # Normalize path segments
+        normalized_path_segments = []
+        for segment, always_wildcard, aggressive_wildcard in path_segments:
+            if always_wildcard or (aggressive_normalization and aggressive_wildcard):
+                normalized_path_segments.append('(.*?)')
+            elif escape:
+                normalized_path_segments.append(escape(segment))
+            else:
+                normalized_path_segments.append(segment)
+        
+        # Build path - NO escaping of forward slashes
+        normalized_path = '/' + '/'.join(normalized_path_segments)
+        
+        # Normalize query parameters
+        normalized_query_parts = []
+        for key, value, aggressive_wildcard in query_pairs:
+            escaped_key = escape(key) if escape else key
+            if aggressive_normalization and aggressive_wildcard:
+                normalized_query_parts.append(f"{escaped_key}=(.*?)")
+            else:
+                escaped_value = escape(value) if escape else value
+                normalized_query_parts.append(f"{escaped_key}={escaped_value}")
+        
+        normalized_query = '&'.join(normalized_query_parts)
+        
+        # Build the normalized URL properly
+        normalized_url = f"{scheme}://{netloc}{normalized_path}"
+        if normalized_query:
+            # For patterns, escape the ? that separates path from query
+            if escape_special_chars:
+                normalized_url += f"\\?{normalized_query}"
+            else:
+                normalized_url += f"?{normalized_query}"
+        
+        if method:
+            normalized_url = f"{method} {normalized_url}"
+            
+        return normalized_url
+    
     def is_sub_pattern_of(self, candidate: str, parent: str) -> bool:
         """Check if candidate is a sub-pattern of parent"""
         if candidate == parent:
@@ -182,8 +210,8 @@ class URLAnalyzer:
         
         # For sub-pattern relationship, the structure should be similar
         # but candidate should have more specific values where parent has wildcards
-        parent_parts = re.split(r'(\?|&|=)', parent_compare)
-        candidate_parts = re.split(r'(\?|&|=)', candidate_compare)
+        parent_parts = self._QSPLIT_RE.split(parent_compare)
+        candidate_parts = self._QSPLIT_RE.split(candidate_compare)
         
         if len(parent_parts) != len(candidate_parts):
             return False
@@ -197,26 +225,32 @@ class URLAnalyzer:
                 
         return True
     
-    def find_subpatterns_in_matching_urls(self, urls: List[str], parent_pattern: str) -> List[Dict[str, Any]]:
+    def find_subpatterns_in_matching_urls(self, urls: List[str], parent_pattern: str,
+                                          parse_cache: Optional[Dict[str, tuple]] = None) -> List[Dict[str, Any]]:
         """Find subpatterns within URLs that match the same parent pattern"""
         if len(urls) <= 1:
             # If only one URL, return the actual URL as URI (not pattern)
             return [{"uri": urls[0], "subPatterns": [], "count": 1}]
         
-        # Group URLs by their less aggressive normalization (without escaping for URIs)
-        sub_pattern_groups = defaultdict(list)
-        for url in urls:
-            sub_pattern = self.normalize_url_pattern(url, aggressive_normalization=False, escape_special_chars=False)
-            sub_pattern_groups[sub_pattern].append(url)
+        # Remove escaping from parent pattern for comparison (loop-invariant, computed once)
+        parent_pattern_clean = parent_pattern.replace('\\', '')
+        
+        # Group URLs by their less aggressive normalization (without escaping for URIs).
+        # Keys are computed up front (from the shared parse cache), then grouped in input order.
+        sub_pattern_keys = [
+            self.normalize_url_pattern(url, aggressive_normalization=False, escape_special_chars=False,
+                                       parse_cache=parse_cache)
+            for url in urls
+        ]
+        sub_pattern_groups = {}
+        for sub_pattern, url in zip(sub_pattern_keys, urls):
+            sub_pattern_groups.setdefault(sub_pattern, []).append(url)
         
         # If all URLs have the same sub-pattern, check if we need to split further
         if len(sub_pattern_groups) == 1:
             sub_pattern = list(sub_pattern_groups.keys())[0]
             pattern_urls = sub_pattern_groups[sub_pattern]
             
-            # Remove escaping from parent pattern for comparison
-            parent_pattern_clean = parent_pattern.replace('\\', '')
-            
             # If the sub-pattern is the same as parent pattern, show actual URLs
             if sub_pattern == parent_pattern_clean or len(pattern_urls) == 1:
                 return [{"uri": url, "subPatterns": [], "count": 1} for url in pattern_urls]
@@ -231,9 +265,6 @@ class URLAnalyzer:
             # Find URLs for this sub-pattern
             pattern_urls = sub_pattern_groups[sub_pattern]
             
-            # Remove escaping from parent pattern for comparison
-            parent_pattern_clean = parent_pattern.replace('\\', '')
-            
             # If sub-pattern is too generic (same as parent), show actual URLs
             if sub_pattern == parent_pattern_clean or len(pattern_urls) == 1:
                 organized_subpatterns.extend([{"uri": url, "subPatterns": [], "count": 1} for url in pattern_urls])
@@ -254,20 +285,26 @@ class URLAnalyzer:
                 "data": {}
             }
         
-        # Step 1: Create aggressive patterns (parent patterns) WITH escaping
+        # Parsed URL parts shared by steps 1 and 2; local to this call so it is freed with it
+        parse_cache: Dict[str, tuple] = {}
+        
+        # Step 1: Create aggressive patterns (parent patterns) WITH escaping.
+        # Normalize each distinct URL once as a batch, then group the full list by lookup.
+        parent_pattern_of = {
+            url: self.normalize_url_pattern(url, aggressive_normalization=True, escape_special_chars=True,
+                                            parse_cache=parse_cache)
+            for url in dict.fromkeys(urls)
+        }
         aggressive_patterns = {}
         for url in urls:
-            parent_pattern = self.normalize_url_pattern(url, aggressive_normalization=True, escape_special_chars=True)
-            if parent_pattern not in aggressive_patterns:
-                aggressive_patterns[parent_pattern] = []
-            aggressive_patterns[parent_pattern].append(url)
+            aggressive_patterns.setdefault(parent_pattern_of[url], []).append(url)
         
         # Step 2: Build the result structure with proper sub-pattern detection
         data = {}
         
         for parent_pattern, parent_urls in aggressive_patterns.items():
             # Find subpatterns within matching URLs (without escaping for URIs)
-            organized_subpatterns = self.find_subpatterns_in_matching_urls(parent_urls, parent_pattern)
+            organized_subpatterns = self.find_subpatterns_in_matching_urls(parent_urls, parent_pattern, parse_cache)
             
             data[parent_pattern] = organized_subpatterns
         
@@ -279,7 +316,7 @@ class URLAnalyzer:
             all_patterns.add(parent_pattern)
             for entry in entries:
                 # For URI entries, use them as-is; for pattern entries, count them
-                if '(.*?)' in entry["uri"] or any(char in entry["uri"] for char in self.special_chars if char not in ['/', ':']):
+                if '(.*?)' in entry["uri"] or self._HAS_SPECIAL_RE.search(entry["uri"]) is not None:
                     all_patterns.add(entry["uri"])
                 all_patterns.update(entry["subPatterns"])
         
@@ -309,15 +346,43 @@ class AnalysisResponse(BaseModel):
 # Initialize analyzer
 analyzer = URLAnalyzer()
 
-@app.post("/analyze", response_model=AnalysisResponse)
-async def analyze_urls(request: AnalysisRequest):
-    """Analyze URLs and return patterns in standard JSON format"""
+async def run_analysis(urls: List[str]) -> AnalysisResponse:
+    """Run the analyzer for an endpoint, mapping failures to HTTP 500"""
     try:
-        result = analyzer.analyze_urls_with_subpatterns(request.urls)
+        # CPU-bound: run off the event loop so other requests aren't blocked
+        result = await run_in_threadpool(analyzer.analyze_urls_with_subpatterns, urls)
         return AnalysisResponse(**result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.post("/analyze", response_model=AnalysisResponse)
+async def analyze_urls(request: AnalysisRequest):
+    """Analyze URLs and return patterns in standard JSON format"""
+    return await run_analysis(request.urls)
+
+@app.post("/analyze/text", response_model=AnalysisResponse)
+async def analyze_urls_text(request: Request):
+    """Analyze URLs sent as a text/plain body, each URL terminated by a newline.
+    
+    Every line counts, so blank URLs are kept and totalUris matches what was sent;
+    only an unterminated final line that is empty (e.g. an empty body) is ignored.
+    """
+    # Consume the body as it arrives so only the URL list is held, not the raw body too
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    urls = []
+    pending = ''
+    try:
+        async for chunk in request.stream():
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            urls.extend(lines)
+        pending += decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be UTF-8 text")
+    if pending:
+        urls.append(pending)
+    return await run_analysis(urls)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""